@@ -1,12 +1,91 @@
 import json
-from openai import OpenAI
 import os
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-client = OpenAI(api_key=OPENAI_API_KEY)
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Create the OpenAI client on first use so importing this module stays cheap.
+
+    Callers run on several threads (Flask, the loop's executor, the health monitor), so creation is locked.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling OpenAI while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """Stop calling OpenAI for `reset_timeout` seconds after `failure_threshold` consecutive failures."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False  # a half-open trial call is in flight
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'  # the next call is a trial
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True  # let exactly one trial call through
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._probing = False
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"OpenAI circuit breaker opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {'state': self.state, 'consecutive_failures': self.failures}
+
+breaker = CircuitBreaker()
+
+def create_chat_completion(**kwargs):
+    """Call the chat completions API through the circuit breaker."""
+    if not breaker.allow():
+        raise CircuitOpenError("OpenAI circuit breaker is open")
+    try:
+        response = get_client().chat.completions.create(**kwargs)
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return response
 
 def generate_ai_response(messages: list, settings: dict) -> str:
     try:
@@ -18,7 +97,7 @@ def generate_ai_response(messages: list, settings: dict) -> str:
         # Keep last 10 messages for better context (increased from 5)
         gpt_messages = [{'role': 'system', 'content': system_prompt}] + messages[-10:]
         
-        response = client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-3.5-turbo",
             messages=gpt_messages,
             temperature=0.7,
@@ -28,7 +107,7 @@ def generate_ai_response(messages: list, settings: dict) -> str:
     except Exception as e:
         logger.error(f"Error generating AI response: {e}")
         return "I apologize, but I'm having trouble processing your request right now. Please try again later."
-def analyze_importance(messages: list, settings: dict, num_exchanges: int) -> dict:
+def analyze_importance(messages: list, settings: dict, num_exchanges: int, raise_errors: bool = False) -> dict:
     try:
         conv_text = '\n'.join([f"{msg['role']}: {msg['content']}" for msg in messages])
         keywords = [kw.strip().lower() for kw in settings.get('keywords', '').split(',')]
@@ -50,7 +129,7 @@ def analyze_importance(messages: list, settings: dict, num_exchanges: int) -> di
 
         Output as JSON: {{"sentiment_score": float, "urgency": "low/medium/high", "intent": "str", "complex": bool, "escalate": bool}}
         """
-        response = client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-3.5-turbo",
             messages=[{'role': 'user', 'content': analysis_prompt}],
             temperature=0.0,
@@ -58,12 +137,14 @@ def analyze_importance(messages: list, settings: dict, num_exchanges: int) -> di
         )
         return json.loads(response.choices[0].message.content)
     except Exception as e:
+        if raise_errors:
+            raise  # let offline tools tell failures apart from "don't escalate"
         logger.error(f"Error analyzing importance: {e}")
         return {"sentiment_score": 0, "urgency": "low", "intent": "unknown", "complex": False, "escalate": False}
 
 def generate_summary(conv_text: str) -> str:
     try:
-        response = client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-3.5-turbo",
             messages=[{'role': 'user', 'content': f"Provide a concise summary of this conversation: {conv_text}"}],
             temperature=0.7
@@ -75,7 +156,7 @@ def generate_summary(conv_text: str) -> str:
 
 def generate_key_points(conv_text: str) -> str:
     try:
-        response = client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-3.5-turbo",
             messages=[{'role': 'user', 'content': f"Extract 2-3 key points as bullet points: {conv_text}"}],
             temperature=0.7
@@ -87,7 +168,7 @@ def generate_key_points(conv_text: str) -> str:
 
 def generate_suggested_action(conv_text: str) -> str:
     try:
-        response = client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-3.5-turbo",
             messages=[{'role': 'user', 'content': f"Suggest an action for the user: {conv_text}"}],
             temperature=0.7
@@ -95,4 +176,60 @@ def generate_suggested_action(conv_text: str) -> str:
         return response.choices[0].message.content
     except Exception as e:
         logger.error(f"Error generating suggested action: {e}")
-        return "No specific action suggested."
\ No newline at end of file
+        return "No specific action suggested."
+
+# Per-conversation limits for digests, so a long transcript cannot crowd out the others
+DIGEST_CONV_CHARS = 3000  # keep only the most recent part of each transcript
+DIGEST_TOKENS_PER_CONV = 250
+
+
+def generate_digest(conversations: list) -> list:
+    """Summarize several escalated conversations with a single request.
+
+    Returns one dict per conversation (same order) with summary, key_points and suggested_action.
+    """
+    fallback = {
+        "summary": "Unable to generate summary at this time.",
+        "key_points": "Unable to extract key points at this time.",
+        "suggested_action": "No specific action suggested."
+    }
+    try:
+        blocks = '\n\n'.join(
+            f"Conversation {i} (from {conv['contact_name']}):\n{conv['conv_text'][-DIGEST_CONV_CHARS:]}"
+            for i, conv in enumerate(conversations, start=1)
+        )
+        digest_prompt = f"""
+        Analyze each of these conversations independently:
+        {blocks}
+
+        For every conversation provide:
+        - summary: a concise summary
+        - key_points: 2-3 key points as bullet points
+        - suggested_action: a suggested action for the user
+
+        Output as JSON: {{"conversations": [{{"index": int, "summary": "str", "key_points": "str", "suggested_action": "str"}}]}}
+        """
+        response = create_chat_completion(
+            model="gpt-3.5-turbo",
+            messages=[{'role': 'user', 'content': digest_prompt}],
+            temperature=0.7,
+            max_tokens=DIGEST_TOKENS_PER_CONV * len(conversations),
+            response_format={"type": "json_object"}
+        )
+        results = [item for item in json.loads(response.choices[0].message.content).get('conversations', [])
+                   if isinstance(item, dict)]
+        by_index = {}
+        for position, item in enumerate(results, start=1):
+            # The model may send the index as a string or leave it out; fall back to list position
+            try:
+                index = int(item.get('index', position))
+            except (TypeError, ValueError):
+                index = position
+            by_index.setdefault(index, item)
+        return [
+            {**fallback, **{k: v for k, v in by_index.get(i, {}).items() if k in fallback}}
+            for i in range(1, len(conversations) + 1)
+        ]
+    except Exception as e:
+        logger.error(f"Error generating digest: {e}")
+        return [dict(fallback) for _ in conversations]
@@ -0,0 +1,138 @@
+"""Export expiring and escalated conversations to rotating gzip-compressed JSONL files.
+
+Usage: python archive.py [--output DIR] [--batch-size N] [--expiring-within SECONDS]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import config
+from db import get_redis, get_conversations_batch, mark_conversations_archived
+
+logger = logging.getLogger(__name__)
+
+
+class RotatingJsonlWriter:
+    """Append JSON lines to gzip files, starting a new file once `max_bytes` of uncompressed JSON is written."""
+
+    def __init__(self, directory: str, max_bytes: int, prefix: str = 'conversations'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.files = []
+        self._file = None
+        self._written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self) -> None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"{self.prefix}-{stamp}-{len(self.files):03d}.jsonl.gz")
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._written = 0
+        self.files.append(path)
+
+    def write(self, record: dict) -> None:
+        if self._file is None or self._written >= self.max_bytes:
+            self.close()
+            self._open()
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        self._file.write(line)
+        self._written += len(line.encode('utf-8'))  # ensure_ascii=False, so characters != bytes
+
+    def write_many(self, records: list) -> None:
+        for record in records:
+            self.write(record)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _should_archive(conv: dict, ttl: int, expiring_within: int) -> bool:
+    """Archive escalated conversations and those about to expire or be cleaned up."""
+    if len(conv.get('conversation', [])) <= int(conv.get('archived_count', 0) or 0):
+        return False  # nothing new since the last export
+    if conv.get('escalated') == '1' or 0 <= ttl <= expiring_within:
+        return True
+    # clean_old_convs deletes by age regardless of the TTL, so catch those before the next sweep
+    started_at = float(conv.get('started_at') or 0)
+    return bool(started_at) and started_at + config.CONVERSATION_TTL - datetime.now().timestamp() <= expiring_within
+
+
+async def export_conversations(output_dir: str = None, batch_size: int = None, expiring_within: int = None) -> int:
+    """Stream escalated and soon-to-expire conversations into the archive.
+
+    Keys are scanned and read in pipelined batches, so memory use does not grow with the keyspace.
+    Returns the number of conversations written.
+    """
+    output_dir = output_dir or config.ARCHIVE_DIR
+    batch_size = batch_size or config.ARCHIVE_BATCH_SIZE
+    expiring_within = config.ARCHIVE_EXPIRING_WITHIN if expiring_within is None else expiring_within
+    exported = 0
+
+    # Compression and file I/O run in a worker thread so the export never stalls the event loop
+    writer = await asyncio.to_thread(RotatingJsonlWriter, output_dir, config.ARCHIVE_MAX_FILE_BYTES)
+    try:
+        cursor = 0
+        while True:
+            cursor, keys = await get_redis().scan(cursor, match="conversations:*", count=batch_size)
+            records = []
+            archived = {}
+            for key, conv, ttl in await get_conversations_batch(keys):
+                if not _should_archive(conv, ttl, expiring_within):
+                    continue
+                records.append({
+                    'user_id': key.split(':', 1)[1],
+                    'owner_id': conv.get('owner_id', ''),
+                    'escalated': conv.get('escalated', '0'),
+                    'escalated_at': int(conv['escalated_at']) if conv.get('escalated_at') else None,
+                    'started_at': conv.get('started_at'),
+                    'archived_at': datetime.now().timestamp(),
+                    'state': conv.get('state', ''),
+                    'conversation': conv.get('conversation', [])
+                })
+                archived[key] = len(conv.get('conversation', []))
+            if records:
+                await asyncio.to_thread(writer.write_many, records)
+            await mark_conversations_archived(archived)
+            exported += len(archived)
+
+            if cursor == 0:
+                break
+    finally:
+        await asyncio.to_thread(writer.close)
+
+    if exported:
+        logger.info(f"Archived {exported} conversations to {', '.join(writer.files)}")
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=config.ARCHIVE_DIR or 'archive')
+    parser.add_argument('--batch-size', type=int, default=config.ARCHIVE_BATCH_SIZE)
+    parser.add_argument('--expiring-within', type=int, default=config.ARCHIVE_EXPIRING_WITHIN,
+                        help='also export non-escalated conversations whose TTL is below this many seconds')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    count = asyncio.run(export_conversations(args.output, args.batch_size, args.expiring_within))
+    print(f"Exported {count} conversations")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark cold start: time to import main and time until the bot is ready.
+
+Usage: python bench_startup.py [--runs N] [--modes eager,lazy] [--timeout SECONDS]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in a fresh interpreter so every measurement is a true cold import
+PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+ready = main.ready_event.wait(timeout={timeout})
+print(json.dumps({{
+    "import": imported,
+    "ready": time.perf_counter() - started if ready else None,
+    "phases": main.startup_timings
+}}))
+"""
+
+
+def run_once(mode: str, timeout: float) -> dict:
+    env = {**os.environ, 'STARTUP_MODE': mode}
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(timeout=timeout)],
+        env=env,
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Probe failed in {mode} mode: {result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--modes', default='eager,lazy')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    for mode in args.modes.split(','):
+        samples = [run_once(mode, args.timeout) for _ in range(args.runs)]
+        import_times = [s['import'] for s in samples]
+        ready_times = [s['ready'] for s in samples if s['ready'] is not None]
+        print(f"[{mode}] import median: {statistics.median(import_times) * 1000:.1f} ms")
+        if ready_times:
+            print(f"[{mode}] ready median:  {statistics.median(ready_times) * 1000:.1f} ms")
+        else:
+            print(f"[{mode}] never became ready within {args.timeout}s")
+        print(f"[{mode}] last run phases: {samples[-1]['phases']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark webhook throughput for different gunicorn worker counts.
+
+The webhook acks an update before processing it, so this measures how fast workers accept
+updates, not how fast handlers finish them.
+
+Usage: python bench_throughput.py [--workers 1,2,4] [--clients 8] [--duration 10] [--path /webhook]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def wait_until_ready(url: str, timeout: float) -> None:
+    """Poll a readiness endpoint until it answers 200; webhooks answer 503 before that."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} was not ready within {timeout}s")
+
+
+def client_loop(args) -> int:
+    url, duration, client_id = args
+    sent = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        # A bare update carries no message, so no handler or LLM call is triggered
+        body = json.dumps({'update_id': client_id * 10_000_000 + sent}).encode()
+        req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        try:
+            urllib.request.urlopen(req, timeout=5).read()
+            sent += 1
+        except Exception:
+            pass
+    return sent
+
+
+def bench(workers: int, port: int, clients: int, duration: float, path: str) -> float:
+    env = {**os.environ, 'WEB_CONCURRENCY': str(workers), 'STARTUP_MODE': 'lazy'}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'main:app', '--config', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', '--access-logfile', '/dev/null'],
+        env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    try:
+        # Only one worker answers each poll, so later workers may still be warming up; their 503s are not counted
+        wait_until_ready(f'http://127.0.0.1:{port}/health/ready', timeout=60)
+        url = f'http://127.0.0.1:{port}{path}'
+        with multiprocessing.Pool(clients) as pool:
+            counts = pool.map(client_loop, [(url, duration, i) for i in range(clients)])
+        return sum(counts) / duration
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default=f'1,{multiprocessing.cpu_count()}')
+    parser.add_argument('--clients', type=int, default=multiprocessing.cpu_count() * 2)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--path', default='/webhook')
+    parser.add_argument('--port', type=int, default=18080)
+    args = parser.parse_args()
+
+    baseline = None
+    failed = False
+    for workers in [int(w) for w in args.workers.split(',')]:
+        rps = bench(workers, args.port, args.clients, args.duration, args.path)
+        if not rps:
+            print(f"{workers} worker(s): FAILED, no updates were acked (check the server logs and --path)")
+            failed = True
+            continue
+        baseline = baseline or rps / workers
+        print(f"{workers} worker(s): {rps:.1f} acked updates/s ({rps / (baseline * workers):.0%} of linear scaling)")
+    print("Note: acked updates/s is the webhook accept rate; update processing continues after the ack.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
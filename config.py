@@ -8,6 +8,17 @@ class Config:
     REDIS_TOKEN: str = os.getenv('UPSTASH_REDIS_REST_TOKEN')
     OPENAI_API_KEY: str = os.getenv('OPENAI_API_KEY')
     PORT: int = int(os.getenv('PORT', 10000))
+
+    # Startup settings
+    STARTUP_MODE: str = os.getenv('STARTUP_MODE', 'eager')  # 'eager' blocks import until ready, 'lazy' warms up in the background
+    DRAIN_TIMEOUT: float = float(os.getenv('DRAIN_TIMEOUT', 25))  # seconds to finish in-flight updates on shutdown
+    TELEGRAM_POOL_SIZE: int = int(os.getenv('TELEGRAM_POOL_SIZE', 16))  # HTTP connections per worker for Bot API calls
+
+    # Health check settings
+    HEALTH_REFRESH_INTERVAL: float = float(os.getenv('HEALTH_REFRESH_INTERVAL', 15))  # seconds between background checks
+    HEALTH_CHECK_TIMEOUT: float = float(os.getenv('HEALTH_CHECK_TIMEOUT', 5))
+    HEALTH_MAX_QUEUE_DEPTH: int = int(os.getenv('HEALTH_MAX_QUEUE_DEPTH', 100))  # in-flight updates before reporting degraded
+    HEALTH_MAX_QUEUE_LAG: float = float(os.getenv('HEALTH_MAX_QUEUE_LAG', 30))  # seconds the oldest in-flight update may wait
     
     # AI Settings
     AI_MODEL: str = "gpt-3.5-turbo"
@@ -18,4 +29,14 @@ class Config:
     CONVERSATION_TTL: int = 86400  # 24 hours
     USER_SETTINGS_TTL: int = 2592000  # 30 days
 
-config = Config()
\ No newline at end of file
+    # Escalation digest settings
+    ESCALATION_DIGEST_WINDOW: int = int(os.getenv('ESCALATION_DIGEST_WINDOW', 0))  # seconds, 0 disables digest mode
+    ESCALATION_DIGEST_MAX_SIZE: int = int(os.getenv('ESCALATION_DIGEST_MAX_SIZE', 10))  # flush early once this many are buffered
+
+    # Conversation archive settings
+    ARCHIVE_DIR: str = os.getenv('ARCHIVE_DIR', '')  # empty disables the scheduled export
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv('ARCHIVE_BATCH_SIZE', 100))  # keys per SCAN/pipeline round trip
+    ARCHIVE_EXPIRING_WITHIN: int = int(os.getenv('ARCHIVE_EXPIRING_WITHIN', 7200))  # export before TTL/cleanup, > scheduler interval
+    ARCHIVE_MAX_FILE_BYTES: int = int(os.getenv('ARCHIVE_MAX_FILE_BYTES', 64 * 1024 * 1024))  # uncompressed bytes per file
+
+config = Config()
@@ -6,28 +6,74 @@ import json
 from datetime import datetime, timedelta
 import asyncio
 from upstash_redis.asyncio import Redis
-from upstash_redis import UpstashRedisException
+from upstash_redis.errors import UpstashError as UpstashRedisException
+from aiohttp import ClientError
 
 # Redis client initialization
 redis_url = os.getenv('UPSTASH_REDIS_REST_URL')
 redis_token = os.getenv('UPSTASH_REDIS_REST_TOKEN')
-redis = Redis(url=redis_url, token=redis_token)
+_redis = None
 
 logger = logging.getLogger(__name__)
 
-redis = Redis(
-    url=redis_url, 
-    token=redis_token,
-    retries=3,
-    retry_interval=1
-)
+def get_redis() -> Redis:
+    """Create the Redis client on first use instead of at import time."""
+    global _redis
+    if _redis is None:
+        _redis = Redis(
+            url=redis_url,
+            token=redis_token,
+            rest_retries=3,
+            rest_retry_interval=1
+        )
+    return _redis
+
+# Errors that mean "Redis unreachable" for lease handling: the worker simply isn't the leader
+LOCK_ERRORS = (UpstashRedisException, ClientError, asyncio.TimeoutError)
+
+# Extend or delete a lock only while it is still held by the caller
+RENEW_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Take every buffered digest entry for an owner at once, so only one flusher sends them
+CLAIM_DIGEST_SCRIPT = """
+local entries = redis.call('lrange', KEYS[1], 0, -1)
+redis.call('del', KEYS[1])
+redis.call('zrem', KEYS[2], ARGV[1])
+return entries
+"""
+PUSH_DIGEST_SCRIPT = """
+local length = redis.call('rpush', KEYS[1], ARGV[1])
+redis.call('expire', KEYS[1], ARGV[2])
+redis.call('zadd', KEYS[2], 'NX', ARGV[3], ARGV[4])
+return {length, redis.call('zscore', KEYS[2], ARGV[4])}
+"""
+DIGEST_DUE_KEY = "digests:due"
+
+# Set a field only on a conversation that still exists, so an expired key is not recreated without a TTL
+MARK_ARCHIVED_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('hset', KEYS[1], 'archived_count', ARGV[1])
+end
+return 0
+"""
 
 async def get_conn():
-    return redis  # Return the global Redis client
+    return get_redis()  # Return the global Redis client
 
 async def get_user_settings(user_id: int) -> dict:
     try:
-        data = await redis.hgetall(f"users:{user_id}")
+        data = await get_redis().hgetall(f"users:{user_id}")
         return data or {}
     except UpstashRedisException as e:
         logger.error(f"Redis error getting user settings for {user_id}: {e}")
@@ -36,42 +82,80 @@ async def get_user_settings(user_id: int) -> dict:
 async def update_user_setting(user_id: int, key_or_dict: str | dict | None, value=None) -> None:
     key = f"users:{user_id}"
     if key_or_dict is None and value is None:
-        await redis.delete(key)  # Clear all settings
+        await get_redis().delete(key)  # Clear all settings
     elif isinstance(key_or_dict, dict):
-        await redis.hset(key, **key_or_dict)
+        await get_redis().hset(key, values=key_or_dict)
     elif value is not None and key_or_dict is not None:
-        await redis.hset(key, key_or_dict, value)
+        await get_redis().hset(key, key_or_dict, value)
     else:
         # Handle single key deletion if value is None
-        await redis.hdel(key, key_or_dict)
-    await redis.expire(key, 2592000)  # 30 days
+        await get_redis().hdel(key, key_or_dict)
+    await get_redis().expire(key, 2592000)  # 30 days
 
 async def get_conversation(user_id: int) -> dict:
-    data = await redis.hgetall(f"conversations:{user_id}")
+    data = await get_redis().hgetall(f"conversations:{user_id}")
     if not data:
         return {}
+    return _decode_conversation(data)
+
+def _decode_conversation(data: dict) -> dict:
     return {
         k: json.loads(v) if k in ['conversation', 'state'] else v
         for k, v in data.items()
     }
 
+async def get_conversations_batch(keys: list) -> list:
+    """Read many conversations in one pipelined round trip.
+
+    Returns (key, conversation, ttl) tuples; keys that expired in the meantime are skipped.
+    """
+    if not keys:
+        return []
+    pipe = get_redis().pipeline()
+    for key in keys:
+        pipe.hgetall(key)
+        pipe.ttl(key)
+    results = await pipe.exec()
+    batch = []
+    # Pipelined replies are formatted like direct calls: HGETALL -> dict, TTL -> int
+    for key, data, ttl in zip(keys, results[0::2], results[1::2]):
+        if data:
+            batch.append((key, _decode_conversation(data), ttl))
+    return batch
+
+async def mark_conversations_archived(archived: dict) -> None:
+    """Remember how many messages of each conversation have been archived.
+
+    `archived` maps key -> message count. Keys that expired during the export are left alone
+    rather than recreated, and the live TTL is never touched.
+    """
+    if not archived:
+        return
+    pipe = get_redis().pipeline()
+    for key, count in archived.items():
+        pipe.eval(MARK_ARCHIVED_SCRIPT, keys=[key], args=[str(count)])
+    await pipe.exec()
+
 async def save_conversation(user_id: int, data: dict) -> None:
     key = f"conversations:{user_id}"
-    await redis.hset(key, **{
+    values = {
         'conversation': json.dumps(data.get('conversation', [])),
         'escalated': str(data.get('escalated', '0')),
         'owner_id': str(data.get('owner_id', '')),
         'state': json.dumps(data.get('state', '')),
         'started_at': str(data.get('started_at', datetime.now().timestamp()))
-    })
-    await redis.expire(key, 86400)  # 24 hours
+    }
+    if data.get('escalated_at'):
+        values['escalated_at'] = str(data['escalated_at'])  # message count when the conversation was escalated
+    await get_redis().hset(key, values=values)
+    await get_redis().expire(key, 86400)  # 24 hours
 
 async def is_busy(user_id: int) -> bool:
     settings = await get_user_settings(user_id)
     return settings.get('busy', '0') == '1'
 
 async def get_user_settings_by_username(username: str) -> dict:
-    async for key in redis.scan_iter(match="users:*"):
+    async for key in get_redis().scan_iter(match="users:*"):
         settings = await get_user_settings(int(key.decode('utf-8').split(':')[1]))
         if settings.get('username') == username:
             return settings
@@ -85,16 +169,16 @@ async def clean_old_convs(max_age_hours: int = 24) -> int:
         # Use SCAN command with cursor to get all conversation keys
         cursor = 0
         while True:
-            cursor, keys = await redis.scan(cursor, match="conversations:*", count=100)
+            cursor, keys = await get_redis().scan(cursor, match="conversations:*", count=100)
             
             for key in keys:
                 try:
                     # Get the started_at field from the conversation
-                    started_at_str = await redis.hget(key, 'started_at')
+                    started_at_str = await get_redis().hget(key, 'started_at')
                     if started_at_str:
                         started_at = float(started_at_str)
                         if started_at < cutoff_time:
-                            await redis.delete(key)
+                            await get_redis().delete(key)
                             deleted_count += 1
                 except Exception as e:
                     logger.error(f"Error processing key {key}: {e}")
@@ -106,4 +190,60 @@ async def clean_old_convs(max_age_hours: int = 24) -> int:
     except Exception as e:
         logger.error(f"Error in clean_old_convs: {e}")
     
-    return deleted_count
\ No newline at end of file
+    return deleted_count
+
+async def acquire_lock(name: str, holder: str, ttl: int) -> bool:
+    """Acquire or renew a lease-based lock. Returns True while `holder` owns it."""
+    key = f"locks:{name}"
+    try:
+        if await get_redis().set(key, holder, nx=True, ex=ttl):
+            return True
+        renewed = await get_redis().eval(RENEW_LOCK_SCRIPT, keys=[key], args=[holder, str(ttl)])
+        return renewed == 1
+    except LOCK_ERRORS as e:
+        logger.error(f"Redis error acquiring lock {name}: {e}")
+        return False
+
+async def release_lock(name: str, holder: str) -> None:
+    key = f"locks:{name}"
+    try:
+        await get_redis().eval(RELEASE_LOCK_SCRIPT, keys=[key], args=[holder])
+    except LOCK_ERRORS as e:
+        logger.error(f"Redis error releasing lock {name}: {e}")
+
+async def push_digest_entry(owner_id: int, entry: dict, due_at: float, ttl: int) -> tuple:
+    """Append an escalation to the owner's digest buffer. Returns (buffer length, window deadline).
+
+    The owner is added to the due set only if no window is open yet, so the first entry sets the deadline
+    and every worker sees the same one.
+    """
+    length, deadline = await get_redis().eval(
+        PUSH_DIGEST_SCRIPT,
+        keys=[f"digests:{owner_id}", DIGEST_DUE_KEY],
+        args=[json.dumps(entry), str(ttl), str(due_at), str(owner_id)]
+    )
+    return int(length), float(deadline)
+
+async def claim_digest_entries(owner_id: int) -> list:
+    """Atomically remove and return all buffered digest entries for an owner."""
+    entries = await get_redis().eval(
+        CLAIM_DIGEST_SCRIPT, keys=[f"digests:{owner_id}", DIGEST_DUE_KEY], args=[str(owner_id)]
+    )
+    return [json.loads(entry) for entry in entries or []]
+
+async def get_due_digest_owners(now: float) -> list:
+    """Owners whose digest window has closed."""
+    owners = await get_redis().zrangebyscore(DIGEST_DUE_KEY, "-inf", now)
+    return [int(owner) for owner in owners]
+
+async def count_pending_digests() -> int:
+    """Number of owners with an open digest window."""
+    return await get_redis().zcard(DIGEST_DUE_KEY)
+
+async def get_job_last_run(name: str) -> float:
+    """When a periodic job last ran anywhere in the cluster (0 if never)."""
+    value = await get_redis().get(f"jobs:{name}:last_run")
+    return float(value) if value else 0.0
+
+async def set_job_last_run(name: str, timestamp: float) -> None:
+    await get_redis().set(f"jobs:{name}:last_run", str(timestamp))
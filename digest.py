@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from config import config
+from ai import generate_digest
+from db import push_digest_entry, claim_digest_entries, get_due_digest_owners
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+# Generated fields are clipped to this length so a section, link included, always fits in one message
+MAX_FIELD_LENGTH = 1000
+
+# Buffered entries outlive their window by this long, giving the scheduler time to deliver them
+DIGEST_BUFFER_GRACE = 86400
+
+# Escalations are buffered in Redis (see db.push_digest_entry) so they survive worker exits.
+# Each worker only keeps timers for the windows it has seen; the scheduler leader flushes any
+# window whose timer died with its worker.
+_flush_tasks: dict[int, asyncio.Task] = {}
+
+
+def is_enabled() -> bool:
+    return config.ESCALATION_DIGEST_WINDOW > 0
+
+
+def pending_count() -> int:
+    """Number of digest windows this worker is timing."""
+    return len(_flush_tasks)
+
+
+async def enqueue_escalation(bot, owner_id: int, contact_name: str, link: str, conv_text: str) -> None:
+    """Buffer an escalation for the owner's next digest, starting the window if needed."""
+    entry = {'contact_name': contact_name, 'link': link, 'conv_text': conv_text}
+    window = config.ESCALATION_DIGEST_WINDOW
+    length, due_at = await push_digest_entry(owner_id, entry, time.time() + window, ttl=window + DIGEST_BUFFER_GRACE)
+    logger.info(f"Buffered escalation for owner {owner_id} ({length} pending)")
+
+    if length >= config.ESCALATION_DIGEST_MAX_SIZE:
+        await flush_owner(bot, owner_id)
+    elif owner_id not in _flush_tasks:
+        _flush_tasks[owner_id] = asyncio.create_task(_flush_after_window(bot, owner_id, due_at))
+
+
+async def _flush_after_window(bot, owner_id: int, due_at: float) -> None:
+    # Sleep until the shared deadline, which may have been set by another worker earlier in the window
+    try:
+        await asyncio.sleep(max(0.0, due_at - time.time()))
+    except asyncio.CancelledError:
+        return
+    _flush_tasks.pop(owner_id, None)
+    await flush_owner(bot, owner_id)
+
+
+async def flush_owner(bot, owner_id: int) -> None:
+    """Summarize all buffered escalations for an owner in one request and send a single digest."""
+    task = _flush_tasks.pop(owner_id, None)
+    if task and task is not asyncio.current_task():
+        task.cancel()
+    entries = await claim_digest_entries(owner_id)
+    if not entries:
+        return  # another worker already sent this window
+
+    try:
+        results = await asyncio.to_thread(generate_digest, entries)
+        sections = []
+        for i, (entry, result) in enumerate(zip(entries, results), start=1):
+            sections.append(f"""
+{i}. From: {_clip(entry['contact_name'], 100)}
+
+Summary: {_clip(result['summary'])}
+
+Key Points:
+{_clip(result['key_points'])}
+
+Direct Link: {entry['link']}
+
+Suggested Action: {_clip(result['suggested_action'])}
+""")
+        header = f"🚨 Priority Conversation Digest ({len(entries)} conversations)\n"
+        for chunk in _chunk_message(header, sections):
+            await bot.send_message(chat_id=owner_id, text=chunk)
+        logger.info(f"Sent digest with {len(entries)} escalations to owner {owner_id}")
+    except Exception as e:
+        logger.error(f"Error flushing digest for owner {owner_id}: {e}", exc_info=True)
+        # Put the entries back so the scheduler retries them instead of losing the alerts
+        for entry in entries:
+            await push_digest_entry(owner_id, entry, time.time(), ttl=DIGEST_BUFFER_GRACE)
+
+
+async def flush_due(bot) -> int:
+    """Send every digest whose window has closed, including those whose worker has exited."""
+    owners = await get_due_digest_owners(time.time())
+    for owner_id in owners:
+        await flush_owner(bot, owner_id)
+    return len(owners)
+
+
+async def flush_all(bot) -> None:
+    """Deliver the digests this worker is timing immediately, e.g. before shutdown."""
+    for owner_id in list(_flush_tasks):
+        await flush_owner(bot, owner_id)
+
+
+def _clip(text, limit: int = MAX_FIELD_LENGTH) -> str:
+    text = str(text)
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def _chunk_message(header: str, sections: list) -> list:
+    """Pack sections into messages; sections are never cut, so every link is delivered."""
+    chunks = []
+    current = header
+    for section in sections:
+        # Never send the header on its own: the first section always shares its message
+        if len(current) + len(section) > MAX_MESSAGE_LENGTH and current != header:
+            chunks.append(current)
+            current = ''
+        current += section
+    if current:
+        chunks.append(current)
+    return chunks
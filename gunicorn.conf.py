@@ -1,16 +1,25 @@
 # gunicorn.conf.py
 import multiprocessing
+import os
+import sys
 
 # Server socket
 bind = "0.0.0.0:10000"
 backlog = 2048
 
 # Worker processes
-workers = 1
-worker_class = "sync"  # Using sync workers
+# Workers share nothing: each one owns its event loop, Telegram application and client pools.
+# Webhook requests only hand updates to that loop, so a few threads per worker keep every core busy.
+# sched_getaffinity counts the cores this container may use; cpu_count() reports the host's
+available_cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else multiprocessing.cpu_count()
+workers = int(os.getenv('WEB_CONCURRENCY', available_cores))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = False  # loops and clients must be created after fork
 max_requests = 1000
 max_requests_jitter = 50
 timeout = 120
+graceful_timeout = float(os.getenv('DRAIN_TIMEOUT', 25)) + 10  # room for main.drain before SIGKILL
 keepalive = 2
 
 # Logging
@@ -34,4 +43,12 @@ def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
 
 def when_ready(server):
-    server.log.info("Server is ready. Spawning workers")
\ No newline at end of file
+    server.log.info("Server is ready. Spawning workers")
+
+def worker_exit(server, worker):
+    # Runs in the worker once it has stopped accepting connections, whether it got a signal
+    # or is being recycled after max_requests, so acked updates are finished before exit
+    app_module = sys.modules.get('main')
+    if app_module is not None:
+        report = app_module.graceful_shutdown()
+        server.log.info("Worker %s drained: %s", worker.pid, report)
@@ -4,6 +4,7 @@ from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackContext  # Added CallbackContext
 from db import get_user_settings, update_user_setting, get_conversation, save_conversation, is_busy, get_user_settings_by_username
 from ai import generate_ai_response, analyze_importance, generate_summary, generate_key_points, generate_suggested_action
+import digest
 import logging
 
 logger = logging.getLogger(__name__)
@@ -201,16 +202,22 @@ async def handle_message(update: Update, context: CallbackContext) -> None:
 
         analysis = analyze_importance(messages, owner_settings, num_exchanges)
         if analysis.get('escalate', False) or has_keyword:
-            await escalate(context, int(owner_id), user_id, contact_name, link, messages)
-            await save_conversation(user_id, {**conv, 'escalated': '1'})
+            urgent = analysis.get('urgency') == 'high' or has_keyword
+            await escalate(context, int(owner_id), user_id, contact_name, link, messages, urgent=urgent)
+            await save_conversation(user_id, {**conv, 'conversation': messages, 'escalated': '1', 'escalated_at': len(messages)})
             
     except Exception as e:
         logger.error(f"Error handling message: {e}", exc_info=True)
         await update.message.reply_text("Sorry, I encountered an error processing your message.")
 
-async def escalate(context: CallbackContext, owner_id: int, contact_id: int, contact_name: str, link: str, messages: list) -> None:
+async def escalate(context: CallbackContext, owner_id: int, contact_id: int, contact_name: str, link: str, messages: list, urgent: bool = False) -> None:
     try:
         conv_text = '\n'.join([f"{msg['role']}: {msg['content']}" for msg in messages])
+        # In digest mode non-urgent escalations wait for the owner's next batched alert
+        if digest.is_enabled() and not urgent:
+            await digest.enqueue_escalation(context.bot, owner_id, contact_name, link, conv_text)
+            return
+
         summary = generate_summary(conv_text)
         key_points = generate_key_points(conv_text)
         suggested = generate_suggested_action(conv_text)
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Latest result of every dependency check. Probes are answered from here without any I/O;
+# db and ai are imported inside the checks so importing this module stays cheap.
+_status = {
+    'redis': {'ok': None, 'checked_at': None, 'latency_ms': None, 'error': None},
+    'openai': {'ok': None, 'checked_at': None, 'latency_ms': None, 'error': None},
+    'queue': {'depth': 0, 'oldest_age': 0.0, 'pending_digests': 0, 'checked_at': None},
+}
+_queue_probe = None
+_breaker = None  # ai.breaker, bound by run_monitor so probes never import anything
+
+
+def set_queue_probe(probe) -> None:
+    """Register a callable returning (in-flight update count, age in seconds of the oldest one)."""
+    global _queue_probe
+    _queue_probe = probe
+
+
+async def _timed_check(name: str, check) -> None:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), timeout=config.HEALTH_CHECK_TIMEOUT)
+        _status[name].update(ok=True, error=None)
+    except Exception as e:
+        logger.warning(f"{name} health check failed: {e}")
+        _status[name].update(ok=False, error=str(e) or type(e).__name__)
+    _status[name].update(
+        checked_at=time.time(),
+        latency_ms=round((time.perf_counter() - started) * 1000, 1)
+    )
+
+
+async def _check_redis() -> None:
+    from db import get_conn
+    conn = await get_conn()
+    await conn.ping()
+
+
+def _list_models() -> None:
+    # Creating the client imports openai and builds an HTTP client, so it must stay off the loop too
+    from ai import get_client
+    get_client().with_options(timeout=config.HEALTH_CHECK_TIMEOUT, max_retries=0).models.list()
+
+
+async def _check_openai() -> None:
+    await asyncio.to_thread(_list_models)
+
+
+def _check_queue() -> None:
+    depth, oldest_age = _queue_probe() if _queue_probe else (0, 0.0)
+    _status['queue'].update(depth=depth, oldest_age=round(oldest_age, 3), checked_at=time.time())
+
+
+async def _check_digests() -> None:
+    """Count open digest windows across the cluster; the last known value is kept if Redis fails."""
+    from db import count_pending_digests
+    try:
+        _status['queue']['pending_digests'] = await asyncio.wait_for(
+            count_pending_digests(), timeout=config.HEALTH_CHECK_TIMEOUT
+        )
+    except Exception as e:
+        logger.warning(f"Pending digest count failed: {e}")
+
+
+async def refresh() -> None:
+    """Run all dependency checks concurrently and update the cached status."""
+    _check_queue()
+    await asyncio.gather(
+        _timed_check('redis', _check_redis),
+        _timed_check('openai', _check_openai),
+        _check_digests()
+    )
+
+
+async def run_monitor() -> None:
+    """Refresh the cached status forever on the application loop."""
+    global _breaker
+    from ai import breaker
+    _breaker = breaker
+    while True:
+        try:
+            await refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing health status: {e}", exc_info=True)
+        await asyncio.sleep(config.HEALTH_REFRESH_INTERVAL)
+
+
+def _is_stale(checked_at) -> bool:
+    return checked_at is None or time.time() - checked_at > config.HEALTH_REFRESH_INTERVAL * 3
+
+
+def readiness(application_ready: bool, shutting_down: bool) -> tuple[bool, dict]:
+    """Build the readiness report from cached results only.
+
+    Not ready when the bot cannot serve at all (not initialized, draining, Redis down or unchecked).
+    OpenAI trouble and queue backlog only mark the report as degraded, since replies fall back gracefully.
+    """
+    _check_queue()
+    redis = _status['redis']
+    openai = _status['openai']
+    queue = _status['queue']
+
+    degradations = []
+    if not openai['ok'] or _is_stale(openai['checked_at']):
+        degradations.append('openai_unreachable')
+    if _breaker is not None and _breaker.state != 'closed':
+        degradations.append(f"ai_circuit_{_breaker.state}")
+    if queue['depth'] > config.HEALTH_MAX_QUEUE_DEPTH:
+        degradations.append('queue_depth')
+    if queue['oldest_age'] > config.HEALTH_MAX_QUEUE_LAG:
+        degradations.append('queue_lag')
+
+    ready = application_ready and not shutting_down and bool(redis['ok']) and not _is_stale(redis['checked_at'])
+    report = {
+        "status": ("degraded" if degradations else "ready") if ready else "not_ready",
+        "application_initialized": application_ready,
+        "shutting_down": shutting_down,
+        "degradations": degradations,
+        "redis": dict(redis),
+        "openai": dict(openai),
+        "ai_circuit_breaker": _breaker.snapshot() if _breaker is not None else None,
+        "queue": dict(queue)
+    }
+    return ready, report
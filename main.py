@@ -1,9 +1,11 @@
 import os
+import time
+_import_started = time.perf_counter()
+
 import asyncio
 import logging
+from contextlib import contextmanager
 from flask import Flask, request, jsonify
-from telegram import Update
-from telegram.ext import Application, ContextTypes
 from dotenv import load_dotenv
 import threading
 import signal
@@ -14,8 +16,9 @@ from logging.handlers import RotatingFileHandler
 
 load_dotenv()
 
-from db import get_conn
-from handlers import setup_handlers
+# Telegram, OpenAI and Redis are imported lazily so the worker can serve requests as early as possible
+from config import config
+import health
 
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
@@ -30,154 +33,286 @@ app = Flask(__name__)
 
 # Global application instance
 application = None
-application_lock = threading.Lock()
 is_shutting_down = False
 
+# Event loop owning the Telegram application and clients, run in a background thread
+_loop = None
+_loop_lock = threading.Lock()
+_init_lock = None
+_warm_up_future = None
+_warm_up_lock = threading.Lock()
+_scheduler_task = None
+ready_event = threading.Event()
+
+# Seconds spent in each startup phase
+startup_timings = {}
+
+# Updates handed to the loop but not finished yet, mapped to when they arrived, tracked so shutdown can drain them
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+@contextmanager
+def timed_phase(name: str):
+    """Record how long a startup phase takes"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = round(time.perf_counter() - started, 4)
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the application event loop, starting its thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="telegram-loop", daemon=True).start()
+    return _loop
+
 async def initialize_app():
     """Initialize Telegram application properly"""
     global application
+    new_application = None
     try:
         logger.info("Initializing Telegram application...")
-        
-        # Create application
-        application = Application.builder().token(TELEGRAM_TOKEN).build()
-        
-        # Setup handlers
-        await setup_handlers(application)
-        
-        # Initialize the application
-        await application.initialize()
-        
-        # Start the application
-        await application.start()
-        
-        # Test Redis connection
-        conn = await get_conn()
-        await conn.ping()
+
+        # Test Redis connection before starting anything that would need to be torn down
+        with timed_phase('redis_ping'):
+            from db import get_conn
+            conn = await get_conn()
+            await conn.ping()
         logger.info("Redis connection established successfully")
-        
+
+        with timed_phase('import_handlers'):
+            from telegram.ext import Application
+            from handlers import setup_handlers
+
+        # Create application and setup handlers
+        with timed_phase('build_application'):
+            new_application = (
+                Application.builder()
+                .token(TELEGRAM_TOKEN)
+                .connection_pool_size(config.TELEGRAM_POOL_SIZE)
+                .build()
+            )
+            await setup_handlers(new_application)
+
+        # Initialize and start the application
+        with timed_phase('telegram_start'):
+            await new_application.initialize()
+            await new_application.start()
+
+        application = new_application
         return application
     except Exception as e:
         logger.error(f"Failed to initialize application: {str(e)}")
         application = None
+        if new_application is not None:
+            await _discard_application(new_application)
         raise
 
-def initialize_application_sync():
-    """Initialize application synchronously"""
-    global application
-    
-    with application_lock:
-        if application is not None:
-            return application
-            
-        try:
-            # Create new event loop for this thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            application = loop.run_until_complete(initialize_app())
-            logger.info("Telegram application initialized and started successfully")
-            return application
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize application: {str(e)}")
-            application = None
-            raise
+async def _discard_application(failed_application) -> None:
+    """Stop and shut down a partially started application so retries don't leak it"""
+    try:
+        if failed_application.running:
+            await failed_application.stop()
+        await failed_application.shutdown()
+    except Exception as e:
+        logger.error(f"Error discarding failed application: {e}")
+
+async def ensure_application():
+    """Return the running application, initializing it on first use"""
+    global _init_lock
+    if _init_lock is None:
+        _init_lock = asyncio.Lock()
+    async with _init_lock:
+        if application is None:
+            await initialize_app()
+    return application
+
+async def warm_up():
+    """Initialize the application, warm up clients and start background jobs"""
+    global _scheduler_task
+    await ensure_application()
+
+    with timed_phase('openai_client'):
+        from ai import get_client
+        await asyncio.to_thread(get_client)
+
+    if _scheduler_task is None:
+        _scheduler_task = asyncio.create_task(run_scheduler(application.bot))
+        logger.info("Scheduler started")
+
+    startup_timings['total'] = round(time.perf_counter() - _import_started, 4)
+    ready_event.set()
+    logger.info(f"Startup timings (s): {startup_timings}")
+
+def start_warm_up() -> concurrent.futures.Future:
+    """Schedule warm-up on the application loop, retrying if the previous attempt failed"""
+    global _warm_up_future
+    with _warm_up_lock:
+        if _warm_up_future is None or (_warm_up_future.done() and not ready_event.is_set()):
+            _warm_up_future = asyncio.run_coroutine_threadsafe(warm_up(), get_loop())
+            _warm_up_future.add_done_callback(_log_warm_up_failure)
+        return _warm_up_future
+
+def _log_warm_up_failure(future):
+    if not future.cancelled() and future.exception():
+        logger.error(f"Warm-up failed: {future.exception()}")
+
+async def process_update_json(data: dict) -> None:
+    """Process a raw webhook payload once the application is ready"""
+    try:
+        current_application = await ensure_application()
+        from telegram import Update
+        update = Update.de_json(data, current_application.bot)
+        if update:
+            await current_application.process_update(update)
+    except Exception as e:
+        logger.error(f"Error processing update: {str(e)}", exc_info=True)
+
+def drain(timeout: float = None) -> dict:
+    """Stop accepting updates and wait up to `timeout` seconds for in-flight work to finish"""
+    global is_shutting_down
+    timeout = config.DRAIN_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+
+    # Any request still reaching this worker gets 503 from here on, so Telegram redelivers it
+    with _inflight_lock:
+        is_shutting_down = True
+        pending = list(_inflight)
+    logger.info(f"Draining {len(pending)} in-flight updates (deadline {timeout}s)...")
+
+    done, not_done = concurrent.futures.wait(pending, timeout=timeout)
+    for future in not_done:
+        future.cancel()
+
+    # Deliver buffered escalation digests instead of dropping them
+    digests_flushed = True
+    if application and _loop:
+        import digest
+        if digest.pending_count():
+            flush = asyncio.run_coroutine_threadsafe(digest.flush_all(application.bot), _loop)
+            try:
+                flush.result(timeout=max(deadline - time.monotonic(), 0))
+            except Exception as e:
+                flush.cancel()
+                digests_flushed = False
+                logger.error(f"Could not flush escalation digests before shutdown: {e}")
+
+    report = {
+        "completed": len(done),
+        "abandoned": len(not_done),
+        "digests_flushed": digests_flushed
+    }
+    logger.info(f"Drain finished: {report}")
+    return report
 
 async def shutdown_application():
     """Shutdown application properly"""
-    global application, is_shutting_down
+    global application, is_shutting_down, _scheduler_task
     
     is_shutting_down = True
+    # Cancelling lets the scheduler release its lease so another worker can take over at once
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+        await asyncio.gather(_scheduler_task, return_exceptions=True)
+        _scheduler_task = None
     if application:
         try:
             logger.info("Shutting down Telegram application...")
-            await application.shutdown()
             await application.stop()
+            await application.shutdown()
             logger.info("Telegram application shut down successfully")
         except Exception as e:
             logger.error(f"Error during application shutdown: {e}")
         finally:
             application = None
 
-def signal_handler(signum, frame):
-    """Handle graceful shutdown"""
-    logger.info(f"Received signal {signum}, initiating graceful shutdown...")
-    
-    # Schedule cleanup
+SHUTDOWN_MARGIN = 5  # seconds for application shutdown beyond the drain budget
+
+def graceful_shutdown() -> dict:
+    """Drain in-flight work, then shut the application down on the loop that owns it.
+
+    Under gunicorn this runs from the worker_exit hook (gunicorn.conf.py), after the worker
+    has stopped accepting connections, for signals and max_requests recycles alike.
+    """
+    report = {}
+    # Drain and application shutdown share DRAIN_TIMEOUT plus a margin, which fits in gunicorn's graceful_timeout
+    deadline = time.monotonic() + config.DRAIN_TIMEOUT + SHUTDOWN_MARGIN
     try:
-        if application:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(shutdown_application())
+        report = drain()
+        if application and _loop:
+            shutdown = asyncio.run_coroutine_threadsafe(shutdown_application(), _loop)
+            shutdown.result(timeout=max(deadline - time.monotonic(), 0))
     except Exception as e:
         logger.error(f"Error during shutdown: {e}")
-    sys.exit(0)
+    return report
 
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+def signal_handler(signum, frame):
+    """Handle graceful shutdown when running the development server directly"""
+    logger.info(f"Received signal {signum}, initiating graceful shutdown...")
+    graceful_shutdown()
+    sys.exit(0)
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
-    global application
     try:
-        with application_lock:
-            if application is None:
-                initialize_application_sync()
-            
-            data = request.get_json()
-            update = Update.de_json(data, application.bot)
-            
-            if update:
-                # Use thread-safe processing
-                loop = application._loop
-                asyncio.run_coroutine_threadsafe(
-                    application.process_update(update),
-                    loop
-                )
-                return '', 200
-                
+        if not ready_event.is_set():
+            # Not acked yet, so Telegram redelivers the update once warm-up has finished
+            start_warm_up()
+            return 'Starting up', 503
+
+        data = request.get_json()
+        with _inflight_lock:
+            if is_shutting_down:
+                # Telegram retries non-2xx responses, so the update is not lost
+                return 'Shutting down', 503
+            # Hand the update to the application loop
+            future = asyncio.run_coroutine_threadsafe(process_update_json(data), get_loop())
+            _inflight[future] = time.monotonic()
+        future.add_done_callback(_untrack_update)
+        return '', 200
     except Exception as e:
         logger.error(f"Webhook error: {str(e)}", exc_info=True)
         return 'Error', 500
 
+def _untrack_update(future):
+    with _inflight_lock:
+        _inflight.pop(future, None)
+
+def _queue_stats() -> tuple:
+    """Number of in-flight updates and how long the oldest one has been waiting"""
+    with _inflight_lock:
+        oldest = min(_inflight.values(), default=None)
+    return len(_inflight), time.monotonic() - oldest if oldest is not None else 0.0
+
+health.set_queue_probe(_queue_stats)
+
+@app.route('/health/live')
+def liveness():
+    """Liveness probe: the worker is up and answering requests"""
+    return jsonify({"status": "alive"})
+
+@app.route('/health/ready')
+def readiness():
+    """Readiness probe served from the cached background checks"""
+    ready, report = health.readiness(application is not None, is_shutting_down)
+    return jsonify(report), 200 if ready else 503
+
 @app.route('/health')
-def health():
+def health_check():
     """Health check endpoint"""
-    try:
-        # Test Redis connection
-        def test_redis():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                conn = loop.run_until_complete(get_conn())
-                loop.run_until_complete(conn.ping())
-                return True
-            except Exception as e:
-                logger.error(f"Redis health check failed: {e}")
-                return False
-            finally:
-                loop.close()
-        
-        import concurrent.futures
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(test_redis)
-            redis_healthy = future.result(timeout=10.0)
-        
-        return jsonify({
-            "status": "healthy" if redis_healthy else "unhealthy",
-            "service": "Telegram AI Human Handoff Bot",
-            "application_initialized": application is not None,
-            "shutting_down": is_shutting_down,
-            "redis_connected": redis_healthy
-        })
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return jsonify({
-            "status": "unhealthy",
-            "error": str(e),
-            "application_initialized": application is not None,
-            "shutting_down": is_shutting_down
-        }), 500
+    ready, report = health.readiness(application is not None, is_shutting_down)
+    return jsonify({
+        **report,
+        "status": "healthy" if ready else "unhealthy",
+        "service": "Telegram AI Human Handoff Bot",
+        "redis_connected": bool(report["redis"]["ok"]),
+        "startup_mode": config.STARTUP_MODE,
+        "ready": ready_event.is_set(),
+        "startup_timings": startup_timings
+    })
 
 def setup_logging():
     logging.basicConfig(
@@ -189,37 +324,40 @@ def setup_logging():
         ]
     )
 
-def start_scheduler():
-    """Start the scheduler in a separate thread"""
-    def run_scheduler_sync():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            from utils import run_scheduler as run_scheduler_task
-            loop.run_until_complete(run_scheduler_task())
-        except Exception as e:
-            logger.error(f"Scheduler error: {e}")
-        finally:
-            loop.close()
-    
-    scheduler_thread = threading.Thread(target=run_scheduler_sync, daemon=True)
-    scheduler_thread.start()
-    logger.info("Scheduler started")
+async def run_scheduler(bot):
+    """Run the cleanup scheduler on the application loop"""
+    try:
+        from utils import run_scheduler as run_scheduler_task
+        await run_scheduler_task(bot)
+    except Exception as e:
+        logger.error(f"Scheduler error: {e}")
 
 # Initialize application on startup
 def initialize_on_startup():
     """Initialize application when the app starts"""
+    # Health checks run independently so they report failures even if warm-up does not finish
+    asyncio.run_coroutine_threadsafe(health.run_monitor(), get_loop())
+    future = start_warm_up()
+    if config.STARTUP_MODE == 'lazy':
+        # Webhooks get 503 until warm-up finishes, and Telegram retries them
+        logger.info("Lazy startup: warming up in the background")
+        return
     try:
-        initialize_application_sync()
-        start_scheduler()
+        future.result()
         logger.info("Application initialized on startup")
     except Exception as e:
         logger.error(f"Failed to initialize application on startup: {e}")
 
+startup_timings['module_import'] = round(time.perf_counter() - _import_started, 4)
+
 # Call initialization on module import
 initialize_on_startup()
 
 if __name__ == '__main__':
+    # Under gunicorn the worker keeps its own signal handlers and drains via worker_exit
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
     port = int(os.getenv('PORT', 10000))
     
     logger.info(f"Starting server on port {port}")
@@ -0,0 +1,127 @@
+"""Replay archived conversations through analyze_importance to evaluate escalation settings offline.
+
+Usage: python replay.py ARCHIVE [ARCHIVE ...] [--threshold Low|Medium|High] [--keywords a,b] [--workers N] [--limit N]
+ARCHIVE may be a .jsonl.gz file or a directory of them.
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from ai import analyze_importance
+
+
+def iter_archived(paths: list):
+    """Yield archived conversations one at a time, in file order."""
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, '*.jsonl.gz'))) if os.path.isdir(path) else [path]
+        for file in files:
+            with gzip.open(file, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+def _snapshot_key(record: dict) -> tuple:
+    return record.get('user_id'), record.get('started_at')
+
+
+def iter_latest_snapshots(paths: list):
+    """Yield only the most recent snapshot of each conversation.
+
+    A conversation that keeps growing is exported again on every run, so the archive holds
+    several snapshots of it. A first pass finds the latest archived_at per (user_id, started_at).
+    """
+    latest = {}
+    for record in iter_archived(paths):
+        key = _snapshot_key(record)
+        latest[key] = max(latest.get(key, 0), record.get('archived_at') or 0)
+    for record in iter_archived(paths):
+        key = _snapshot_key(record)
+        if key in latest and (record.get('archived_at') or 0) == latest[key]:
+            del latest[key]
+            yield record
+
+
+def replay_one(record: dict, settings: dict) -> tuple:
+    """Return (archived escalation, replayed escalation) for one conversation, mirroring handle_message.
+
+    Escalated conversations are replayed only up to the message where they were escalated, since the
+    archived transcript also holds the exchanges that followed. API errors are raised, not treated as
+    "don't escalate", so they can be counted separately.
+    """
+    messages = record.get('conversation', [])
+    if record.get('escalated') == '1' and record.get('escalated_at'):
+        messages = messages[:record['escalated_at']]
+    user_messages = [m for m in messages if m['role'] == 'user']
+    keywords = [kw.strip().lower() for kw in settings.get('keywords', '').split(',') if kw.strip()]
+    has_keyword = any(any(kw in m['content'].lower() for kw in keywords) for m in user_messages)
+    if has_keyword:
+        return record.get('escalated') == '1', True  # keywords escalate regardless of the analysis
+    analysis = analyze_importance(messages, settings, len(user_messages), raise_errors=True)
+    return record.get('escalated') == '1', bool(analysis.get('escalate', False))
+
+
+def replay(records, settings: dict, workers: int) -> Counter:
+    """Run replay_one in parallel, keeping at most 2 * workers conversations in memory.
+
+    Outcomes are keyed by (archived, replayed); conversations whose analysis failed are counted under 'failed'.
+    """
+    outcomes = Counter()
+
+    def collect(future):
+        try:
+            outcomes[future.result()] += 1
+        except Exception:
+            outcomes['failed'] += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        window = deque()
+        for record in records:
+            window.append(executor.submit(replay_one, record, settings))
+            if len(window) >= workers * 2:
+                collect(window.popleft())
+        while window:
+            collect(window.popleft())
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('archives', nargs='+')
+    parser.add_argument('--threshold', default='Medium', choices=['Low', 'Medium', 'High'])
+    parser.add_argument('--keywords', default='')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--limit', type=int, default=None, help='replay at most this many conversations')
+    args = parser.parse_args()
+
+    settings = {'importance_threshold': args.threshold, 'keywords': args.keywords}
+    records = iter_latest_snapshots(args.archives)
+    if args.limit:
+        records = (record for i, record in zip(range(args.limit), records))
+    outcomes = replay(records, settings, args.workers)
+
+    failed = outcomes.pop('failed', 0)
+    total = sum(outcomes.values())
+    if failed:
+        print(f"Analysis failed for {failed} conversations; they are excluded from the numbers below")
+    if not total:
+        print("No archived conversations could be replayed")
+        return
+    escalated_before = outcomes[(True, True)] + outcomes[(True, False)]
+    escalated_after = outcomes[(True, True)] + outcomes[(False, True)]
+    print(f"Replayed {total} conversations with threshold={args.threshold} keywords={args.keywords or '-'}")
+    print(f"Escalated originally: {escalated_before} ({escalated_before / total:.1%})")
+    print(f"Escalated on replay:  {escalated_after} ({escalated_after / total:.1%})")
+    print(f"Newly escalated: {outcomes[(False, True)]}, no longer escalated: {outcomes[(True, False)]}")
+    print(f"Agreement: {(outcomes[(True, True)] + outcomes[(False, False)]) / total:.1%}")
+
+
+if __name__ == '__main__':
+    main()
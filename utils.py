@@ -1,24 +1,62 @@
 import asyncio
 import logging
-from db import clean_old_convs
+import os
+import socket
+import time
+from config import config
+from db import clean_old_convs, acquire_lock, release_lock, get_job_last_run, set_job_last_run
+from archive import export_conversations
+import digest
 
 logger = logging.getLogger(__name__)
 
+# Only the worker holding this lease runs periodic jobs, so sweeps happen once per cluster
+SCHEDULER_LOCK = "scheduler"
+CHECK_INTERVAL = 300  # 5 minutes
+LEASE_TTL = CHECK_INTERVAL * 2  # survives one missed renewal
+CLEANUP_INTERVAL = 3600  # 1 hour
 
-async def run_scheduler():
+
+async def run_scheduler(bot=None):
     """
     Run a scheduler to clean old conversations periodically with better error handling.
+    Every worker runs this loop, but only the current lease holder performs the cleanup
+    and delivers escalation digests whose window timer was lost with its worker.
     """
-    while True:
-        try:
-            deleted_count = await clean_old_convs(max_age_hours=24)
-            if deleted_count > 0:
-                logger.info(f"Cleaned {deleted_count} old conversations")
-            else:
-                logger.debug("No old conversations to clean")
-        except Exception as e:
-            logger.error(f"Error in scheduler: {str(e)}", exc_info=True)
-        
-        # Wait for 1 hour with smaller intervals for better shutdown responsiveness
-        for _ in range(12):  # Check every 5 minutes for 1 hour
-            await asyncio.sleep(300)  # 5 minutes
\ No newline at end of file
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    is_leader = False
+    try:
+        while True:
+            try:
+                was_leader = is_leader
+                is_leader = await acquire_lock(SCHEDULER_LOCK, holder, LEASE_TTL)
+                if is_leader != was_leader:
+                    logger.info(f"Scheduler leadership {'acquired' if is_leader else 'lost'} by {holder}")
+
+                if is_leader and bot is not None and digest.is_enabled():
+                    flushed = await digest.flush_due(bot)
+                    if flushed:
+                        logger.info(f"Delivered {flushed} overdue escalation digests")
+
+                # The last sweep time is shared, so a new leader does not sweep again right away
+                if is_leader and time.time() - await get_job_last_run('cleanup') >= CLEANUP_INTERVAL:
+                    # Archive transcripts before the sweep deletes them; a failed export must not block cleanup
+                    if config.ARCHIVE_DIR:
+                        try:
+                            await export_conversations()
+                        except Exception as e:
+                            logger.error(f"Error exporting conversations: {str(e)}", exc_info=True)
+                    deleted_count = await clean_old_convs(max_age_hours=24)
+                    await set_job_last_run('cleanup', time.time())
+                    if deleted_count > 0:
+                        logger.info(f"Cleaned {deleted_count} old conversations")
+                    else:
+                        logger.debug("No old conversations to clean")
+            except Exception as e:
+                logger.error(f"Error in scheduler: {str(e)}", exc_info=True)
+
+            # Renew the lease (or try to take it over) every 5 minutes
+            await asyncio.sleep(CHECK_INTERVAL)
+    finally:
+        if is_leader:
+            await release_lock(SCHEDULER_LOCK, holder)